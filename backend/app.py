@@ -7,6 +7,9 @@ from routes.auth import router as auth_router
 from routes.chat import router as chat_router
 from routes.ingest import router as ingest_router
 from routes.history import router as history_router
+from routes.memory import router as memory_router
+from lifecycle import compaction_job
+from indexer import indexer_job, summarizer_job
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -31,6 +34,19 @@ app.include_router(auth_router)
 app.include_router(chat_router)
 app.include_router(ingest_router)
 app.include_router(history_router)
+app.include_router(memory_router)
+
+@app.on_event("startup")
+def start_background_jobs():
+    compaction_job.start()
+    indexer_job.start()
+    summarizer_job.start()
+
+@app.on_event("shutdown")
+def stop_background_jobs():
+    indexer_job.stop()
+    summarizer_job.stop()
+    compaction_job.stop()
 
 @app.get("/")
 def root():
@@ -41,11 +57,13 @@ def health_check():
     from embeddings import embedding_service
     from config import settings
     from embeddings import GENAI_AVAILABLE
+    import lifecycle
     
     status = {
         "status": "healthy",
         "chromadb_available": embedding_service.collection is not None,
         "gemini_available": GENAI_AVAILABLE and bool(settings.GEMINI_KEY),
+        "last_compaction": lifecycle.last_compaction,
     }
     return status
 
@@ -12,4 +12,24 @@ class Settings:
     EMBED_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
     GEMINI_KEY = os.getenv("GEMINI_API_KEY", "")
 
+    # Memory lifecycle (0 disables the corresponding limit)
+    MEMORY_MAX_CHUNKS_PER_USER = int(os.getenv("MEMORY_MAX_CHUNKS_PER_USER", "5000"))
+    MEMORY_TTL_DAYS = int(os.getenv("MEMORY_TTL_DAYS", "180"))
+    CONVERSATION_ARCHIVE_DAYS = int(os.getenv("CONVERSATION_ARCHIVE_DAYS", "90"))
+    COMPACTION_INTERVAL_MINUTES = int(os.getenv("COMPACTION_INTERVAL_MINUTES", "60"))
+
+    # Conversation memory indexing (0 disables the corresponding job)
+    CONVERSATION_INDEX_INTERVAL_SECONDS = int(os.getenv("CONVERSATION_INDEX_INTERVAL_SECONDS", "30"))
+    CONVERSATION_INDEX_BATCH_SIZE = int(os.getenv("CONVERSATION_INDEX_BATCH_SIZE", "64"))
+    # Rows younger than this are left for the next run so concurrent inserts can commit first
+    CONVERSATION_INDEX_SETTLE_SECONDS = int(os.getenv("CONVERSATION_INDEX_SETTLE_SECONDS", "10"))
+    CONVERSATION_SUMMARY_INTERVAL_MINUTES = int(os.getenv("CONVERSATION_SUMMARY_INTERVAL_MINUTES", "60"))
+    CONVERSATION_SUMMARY_AFTER_DAYS = int(os.getenv("CONVERSATION_SUMMARY_AFTER_DAYS", "7"))
+    CONVERSATION_SUMMARY_GROUP_SIZE = int(os.getenv("CONVERSATION_SUMMARY_GROUP_SIZE", "20"))
+    # Lifecycle limits for conversation memories (turns and summaries), separate from document chunks
+    CONVERSATION_MEMORY_MAX_PER_USER = int(os.getenv("CONVERSATION_MEMORY_MAX_PER_USER", "2000"))
+    CONVERSATION_MEMORY_TTL_DAYS = int(os.getenv("CONVERSATION_MEMORY_TTL_DAYS", "0"))
+    # Multiplier on conversation-memory distances when blending with documents (>1 favours documents)
+    CONVERSATION_MEMORY_WEIGHT = float(os.getenv("CONVERSATION_MEMORY_WEIGHT", "1.0"))
+
 settings = Settings()
\ No newline at end of file
@@ -1,4 +1,5 @@
 import logging
+import threading
 from typing import List
 import chromadb
 from chromadb import PersistentClient
@@ -17,9 +18,17 @@ except Exception as e:
 
 from config import settings
 
+MEMORY_COLLECTION = "user_memories"
+CONVERSATION_COLLECTION = "conversation_memories"
+# Temporary names used while compaction swaps in a rebuilt collection
+COMPACTING_SUFFIX = "_compacting"
+RETIRED_SUFFIX = "_retired"
+
 class EmbeddingService:
     def __init__(self):
         logger.info("Initializing EmbeddingService...")
+        # Serializes writes against collection rebuilds done by compaction
+        self.lock = threading.RLock()
         self.use_gemini_embeddings = bool(settings.GEMINI_KEY and GENAI_AVAILABLE)
         
         # Initialize Gemini if available
@@ -46,12 +55,34 @@ class EmbeddingService:
         # Initialize ChromaDB
         try:
             self.chroma_client = PersistentClient(path=settings.CHROMA_DIR)
-            self.collection = self.chroma_client.get_or_create_collection(name="user_memories")
+            self.collection = self._open_collection(MEMORY_COLLECTION)
+            self.conversation_collection = self._open_collection(CONVERSATION_COLLECTION)
             logger.info("ChromaDB initialized successfully")
         except Exception as e:
             logger.error(f"ChromaDB initialization failed: {e}")
             self.chroma_client = None
             self.collection = None
+            self.conversation_collection = None
+
+    def _open_collection(self, name: str):
+        """
+        Open a collection, recovering it if compaction was interrupted between
+        renaming the old copy aside and renaming the rebuilt one in.
+        """
+        try:
+            return self.chroma_client.get_collection(name=name)
+        except Exception:
+            pass
+        # The retired copy is the complete original; the compacting one may be partial
+        for suffix in (RETIRED_SUFFIX, COMPACTING_SUFFIX):
+            try:
+                leftover = self.chroma_client.get_collection(name=name + suffix)
+            except Exception:
+                continue
+            leftover.modify(name=name)
+            logger.warning(f"Recovered collection {name} from {name + suffix}")
+            return leftover
+        return self.chroma_client.get_or_create_collection(name=name)
 
     def embed_texts(self, texts: List[str]) -> List[List[float]]:
         if not texts:
@@ -0,0 +1,204 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import func
+
+from config import settings
+from database import SessionLocal
+from models import Conversation, IndexWatermark
+from embeddings import embedding_service
+from jobs import PeriodicJob
+from lifecycle import PAGE_SIZE, delete_memories, mark_dirty
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "conversation_memories"
+# Assistant replies are templated from retrieved context; indexing them would feed them back in
+INDEXED_ROLES = ("user",)
+SUMMARY_LINE_CHARS = 200
+SUMMARY_MAX_CHARS = 2000
+
+def _get_watermark(db) -> IndexWatermark:
+    mark = db.query(IndexWatermark).filter(IndexWatermark.name == WATERMARK_NAME).first()
+    if not mark:
+        mark = IndexWatermark(name=WATERMARK_NAME, last_id=0)
+        db.add(mark)
+        db.flush()
+    return mark
+
+def _turn_record_id(row: Conversation) -> str:
+    # created_at disambiguates ids SQLite may reuse once archival empties the table
+    if row.created_at:
+        return f"turn-{row.id}-{row.created_at:%Y%m%d%H%M%S%f}"
+    return f"turn-{row.id}"
+
+def index_new_turns() -> int:
+    """
+    Embed conversation rows past the id watermark in batches and advance it.
+
+    The watermark only moves over rows older than
+    CONVERSATION_INDEX_SETTLE_SECONDS: ids are assigned at insert but become
+    visible at commit, so a lower id can appear after a higher one. Record
+    ids are derived from the row, so a batch replayed after a failed commit
+    is upserted rather than duplicated.
+    """
+    if embedding_service.conversation_collection is None:
+        return 0
+    indexed = 0
+    settle_cutoff = datetime.utcnow() - timedelta(seconds=settings.CONVERSATION_INDEX_SETTLE_SECONDS)
+    db = SessionLocal()
+    try:
+        mark = _get_watermark(db)
+        max_id = db.query(func.max(Conversation.id)).scalar()
+        if mark.last_id and (max_id is None or max_id < mark.last_id):
+            # Ids went backwards (table emptied by archival without AUTOINCREMENT)
+            logger.warning(f"Conversation ids reset below watermark {mark.last_id}; rescanning")
+            mark.last_id = 0
+            db.commit()
+
+        while True:
+            rows = (
+                db.query(Conversation)
+                .filter(Conversation.id > mark.last_id)
+                .order_by(Conversation.id.asc())
+                .limit(settings.CONVERSATION_INDEX_BATCH_SIZE)
+                .all()
+            )
+            settled = []
+            for r in rows:
+                if r.created_at and r.created_at >= settle_cutoff:
+                    break
+                settled.append(r)
+            if not settled:
+                break
+
+            turns = [r for r in settled if r.role in INDEXED_ROLES and r.text and r.text.strip()]
+            if turns:
+                texts = [r.text for r in turns]
+                embeddings = embedding_service.embed_texts(texts)
+                metadatas = [{
+                    "user_id": r.user_id,
+                    "conversation_id": r.id,
+                    "role": r.role,
+                    "kind": "turn",
+                    "timestamp": (r.created_at or datetime.utcnow()).isoformat()
+                } for r in turns]
+                record_ids = [_turn_record_id(r) for r in turns]
+                with embedding_service.lock:
+                    embedding_service.conversation_collection.upsert(
+                        ids=record_ids,
+                        documents=texts,
+                        metadatas=metadatas,
+                        embeddings=embeddings
+                    )
+                    mark_dirty(embedding_service.conversation_collection, record_ids)
+                indexed += len(turns)
+
+            mark.last_id = settled[-1].id
+            db.commit()
+            if len(settled) < settings.CONVERSATION_INDEX_BATCH_SIZE:
+                break
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if indexed:
+        logger.info(f"Indexed {indexed} conversation turns")
+    return indexed
+
+def _summarize(turns: List[dict]) -> Tuple[str, List[dict]]:
+    """
+    Extractive summary: one truncated line per turn, each turn getting an
+    equal share of SUMMARY_MAX_CHARS. Returns the text and the turns it
+    actually covers; turns that would overflow the cap are left out.
+    """
+    first = turns[0]["meta"].get("timestamp", "")[:10]
+    last = turns[-1]["meta"].get("timestamp", "")[:10]
+    header = f"Earlier conversation ({first} to {last}):"
+    # Leave room for the longest role prefix, the newline and the ellipsis
+    line_chars = min(SUMMARY_LINE_CHARS, (SUMMARY_MAX_CHARS - len(header)) // len(turns) - 15)
+    line_chars = max(line_chars, 1)
+
+    lines = [header]
+    length = len(header)
+    covered = []
+    for t in turns:
+        text = " ".join(t["text"].split())
+        if len(text) > line_chars:
+            text = text[:line_chars].rstrip() + "..."
+        line = f"{t['meta'].get('role', 'user')}: {text}"
+        if length + 1 + len(line) > SUMMARY_MAX_CHARS:
+            break
+        lines.append(line)
+        length += 1 + len(line)
+        covered.append(t)
+    return "\n".join(lines), covered
+
+def summarize_old_turns() -> int:
+    """
+    Collapse turns older than CONVERSATION_SUMMARY_AFTER_DAYS into summary
+    memories of CONVERSATION_SUMMARY_GROUP_SIZE turns each. Only full groups
+    are collapsed; a user's remaining old turns wait for a later run.
+    """
+    collection = embedding_service.conversation_collection
+    if collection is None or settings.CONVERSATION_SUMMARY_AFTER_DAYS <= 0:
+        return 0
+    cutoff = (datetime.utcnow() - timedelta(days=settings.CONVERSATION_SUMMARY_AFTER_DAYS)).isoformat()
+
+    by_user: Dict[int, List[dict]] = defaultdict(list)
+    offset = 0
+    while True:
+        page = collection.get(
+            where={"kind": "turn"}, include=["documents", "metadatas"], limit=PAGE_SIZE, offset=offset
+        )
+        ids = page.get("ids") or []
+        if not ids:
+            break
+        for record_id, doc, meta in zip(ids, page["documents"], page["metadatas"]):
+            if meta.get("timestamp", "") < cutoff:
+                by_user[meta.get("user_id")].append({"id": record_id, "text": doc or "", "meta": meta})
+        offset += len(ids)
+
+    group_size = max(settings.CONVERSATION_SUMMARY_GROUP_SIZE, 1)
+    collapsed = 0
+    for user_id, turns in by_user.items():
+        turns.sort(key=lambda t: t["meta"].get("conversation_id", 0))
+        for i in range(0, len(turns) - group_size + 1, group_size):
+            summary, group = _summarize(turns[i:i + group_size])
+            if not group:
+                continue
+            first_id = group[0]["meta"].get("conversation_id", 0)
+            last_id = group[-1]["meta"].get("conversation_id", 0)
+            embeddings = embedding_service.embed_texts([summary])
+            summary_id = "summary-" + group[0]["id"][len("turn-"):]
+            with embedding_service.lock:
+                embedding_service.conversation_collection.upsert(
+                    ids=[summary_id],
+                    documents=[summary],
+                    metadatas=[{
+                        "user_id": user_id,
+                        "kind": "summary",
+                        "first_conversation_id": first_id,
+                        "last_conversation_id": last_id,
+                        "timestamp": group[-1]["meta"].get("timestamp", ""),
+                    }],
+                    embeddings=embeddings
+                )
+                mark_dirty(embedding_service.conversation_collection, [summary_id])
+                delete_memories(embedding_service.conversation_collection, [t["id"] for t in group])
+            collapsed += len(group)
+
+    if collapsed:
+        logger.info(f"Collapsed {collapsed} conversation turns into summaries")
+    return collapsed
+
+indexer_job = PeriodicJob(
+    "conversation-indexer", settings.CONVERSATION_INDEX_INTERVAL_SECONDS, index_new_turns
+)
+summarizer_job = PeriodicJob(
+    "conversation-summarizer", settings.CONVERSATION_SUMMARY_INTERVAL_MINUTES * 60, summarize_old_turns
+)
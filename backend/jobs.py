@@ -0,0 +1,42 @@
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class PeriodicJob:
+    """
+    Run a function on a daemon thread every `interval_seconds` until stopped.
+    An interval of 0 or less disables the job.
+    """
+
+    def __init__(self, name: str, interval_seconds: float, func: Callable[[], object]):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.func = func
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.interval_seconds <= 0:
+            logger.info(f"Background job '{self.name}' disabled")
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        logger.info(f"Background job '{self.name}' started (every {self.interval_seconds}s)")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.func()
+            except Exception as e:
+                logger.error(f"Background job '{self.name}' failed: {e}")
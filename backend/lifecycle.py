@@ -0,0 +1,373 @@
+import os
+import logging
+import sqlite3
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from config import settings
+from database import SessionLocal, engine
+from models import Conversation, ConversationArchive
+from embeddings import embedding_service, COMPACTING_SUFFIX, RETIRED_SUFFIX
+from jobs import PeriodicJob
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000
+ARCHIVE_BATCH_SIZE = 500
+CHROMA_SQLITE_FILE = "chroma.sqlite3"
+# How long the Chroma vacuum waits on a busy file while holding the service lock
+CHROMA_VACUUM_TIMEOUT_SECONDS = 5
+# EmbeddingService attribute of each collection compaction maintains, with the
+# settings holding its per-user quota and TTL
+COMPACTED_COLLECTIONS = (
+    ("collection", "MEMORY_MAX_CHUNKS_PER_USER", "MEMORY_TTL_DAYS"),
+    ("conversation_collection", "CONVERSATION_MEMORY_MAX_PER_USER", "CONVERSATION_MEMORY_TTL_DAYS"),
+)
+
+# Vectors deleted per collection since its last rebuild; compaction only rebuilds when > 0
+_pending_deletes: Dict[str, int] = defaultdict(int)
+last_compaction: Dict = {}
+# Ids updated in place while a collection is being rebuilt, keyed by collection name
+_rebuild_dirty: Dict[str, set] = {}
+
+def _parse_ts(value) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def _last_used(meta: dict) -> datetime:
+    """
+    Most recent of ingest time and last retrieval, so frequently recalled
+    memories outlive their ingest age.
+    """
+    stamps = [_parse_ts(meta.get("timestamp")), _parse_ts(meta.get("last_retrieved"))]
+    stamps = [s for s in stamps if s]
+    return max(stamps) if stamps else datetime.min
+
+def _iter_records(collection, where: Optional[dict] = None) -> Iterator[Tuple[str, dict]]:
+    offset = 0
+    while True:
+        page = collection.get(where=where, include=["metadatas"], limit=PAGE_SIZE, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            return
+        metas = page.get("metadatas") or [{}] * len(ids)
+        for record_id, meta in zip(ids, metas):
+            yield record_id, meta or {}
+        offset += len(ids)
+
+def mark_dirty(collection, ids: Iterable[str]):
+    """
+    Note in-place writes (metadata updates, upserts of existing ids) so a
+    rebuild running concurrently re-copies them. Call while holding the lock.
+    """
+    dirty = _rebuild_dirty.get(collection.name)
+    if dirty is not None:
+        dirty.update(ids)
+
+def delete_memories(collection, ids: List[str]) -> int:
+    if not ids:
+        return 0
+    with embedding_service.lock:
+        for i in range(0, len(ids), PAGE_SIZE):
+            collection.delete(ids=ids[i:i + PAGE_SIZE])
+    _pending_deletes[collection.name] += len(ids)
+    return len(ids)
+
+def _over_quota(records: List[Tuple[str, dict]], quota: int, protected: Iterable[str] = ()) -> List[str]:
+    """
+    Pick the records to drop so at most `quota` remain: least retrieved first,
+    then least recently used. Ids in `protected` are never picked.
+    """
+    excess = len(records) - quota
+    if quota <= 0 or excess <= 0:
+        return []
+    protected = set(protected)
+    candidates = [r for r in records if r[0] not in protected]
+    ranked = sorted(candidates, key=lambda r: (r[1].get("retrieval_count", 0), _last_used(r[1])))
+    return [record_id for record_id, _ in ranked[:excess]]
+
+def record_retrievals(ids: List[str], metadatas: List[dict], collection=None):
+    """
+    Bump retrieval_count / last_retrieved on memories returned by a query.
+    """
+    collection = collection or embedding_service.collection
+    if not collection or not ids:
+        return
+    now = datetime.utcnow().isoformat()
+    updated = []
+    for meta in metadatas:
+        meta = dict(meta or {})
+        meta["retrieval_count"] = int(meta.get("retrieval_count", 0)) + 1
+        meta["last_retrieved"] = now
+        updated.append(meta)
+    # Called on the chat path: skip rather than wait if a write or swap holds the lock
+    if not embedding_service.lock.acquire(blocking=False):
+        return
+    try:
+        collection.update(ids=ids, metadatas=updated)
+        mark_dirty(collection, ids)
+    except Exception as e:
+        logger.warning(f"Failed to record retrievals: {e}")
+    finally:
+        embedding_service.lock.release()
+
+def enforce_user_quota(user_id: int, collection=None, protected: Iterable[str] = ()) -> int:
+    """
+    Trim a user back to MEMORY_MAX_CHUNKS_PER_USER, keeping the `protected`
+    ids (the chunks the current ingest just added).
+    """
+    collection = collection or embedding_service.collection
+    if not collection or settings.MEMORY_MAX_CHUNKS_PER_USER <= 0:
+        return 0
+    records = list(_iter_records(collection, where={"user_id": user_id}))
+    evicted = delete_memories(
+        collection, _over_quota(records, settings.MEMORY_MAX_CHUNKS_PER_USER, protected)
+    )
+    if evicted:
+        logger.info(f"Evicted {evicted} chunks over quota for user {user_id}")
+    return evicted
+
+def evict_memories(collection, max_per_user: int, ttl_days: int) -> Dict[str, int]:
+    """
+    Drop memories unused for `ttl_days`, then trim every user to `max_per_user`.
+    """
+    if not collection:
+        return {"ttl": 0, "quota": 0}
+
+    cutoff = None
+    if ttl_days > 0:
+        cutoff = datetime.utcnow() - timedelta(days=ttl_days)
+
+    expired = []
+    by_user = defaultdict(list)
+    for record_id, meta in _iter_records(collection):
+        if cutoff and _last_used(meta) < cutoff:
+            expired.append(record_id)
+        else:
+            by_user[meta.get("user_id")].append((record_id, meta))
+
+    over_quota = []
+    for records in by_user.values():
+        over_quota.extend(_over_quota(records, max_per_user))
+
+    return {"ttl": delete_memories(collection, expired), "quota": delete_memories(collection, over_quota)}
+
+def archive_conversations() -> int:
+    """
+    Move conversation rows older than CONVERSATION_ARCHIVE_DAYS into conversations_archive.
+    """
+    if settings.CONVERSATION_ARCHIVE_DAYS <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=settings.CONVERSATION_ARCHIVE_DAYS)
+    archived = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = (
+                db.query(Conversation)
+                .filter(Conversation.created_at < cutoff)
+                .order_by(Conversation.id.asc())
+                .limit(ARCHIVE_BATCH_SIZE)
+                .all()
+            )
+            if not rows:
+                break
+            for r in rows:
+                db.add(ConversationArchive(
+                    original_id=r.id, user_id=r.user_id, role=r.role, text=r.text, created_at=r.created_at
+                ))
+                db.delete(r)
+            db.commit()
+            archived += len(rows)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return archived
+
+def _add_page(target, page) -> List[str]:
+    ids = page.get("ids") or []
+    if ids:
+        target.upsert(
+            ids=ids,
+            documents=page["documents"],
+            metadatas=page["metadatas"],
+            embeddings=page["embeddings"],
+        )
+    return ids
+
+def _drop_collection(name: str) -> bool:
+    try:
+        embedding_service.chroma_client.delete_collection(name)
+        return True
+    except Exception:
+        return False
+
+def rebuild_collection(attr: str):
+    """
+    Copy live records of the collection held in `embedding_service.<attr>`
+    into a fresh collection, dropping the deleted entries the old index still
+    carries, and swap it in under the same name.
+
+    The bulk copy runs without the lock; only reconciling writes made during
+    the copy and the renames are done under it. Ids added or deleted meanwhile
+    are found by comparing id sets; ids updated in place are re-copied from
+    the set writers fill through mark_dirty. The old collection is renamed
+    aside rather than deleted so in-flight queries keep working; it is dropped
+    at the start of the next compaction run.
+    """
+    collection = getattr(embedding_service, attr)
+    name = collection.name
+    _drop_collection(name + COMPACTING_SUFFIX)
+    fresh = embedding_service.chroma_client.create_collection(
+        name=name + COMPACTING_SUFFIX, metadata=collection.metadata
+    )
+    with embedding_service.lock:
+        _rebuild_dirty[name] = set()
+    try:
+        copied = set()
+        offset = 0
+        while True:
+            ids = _add_page(fresh, collection.get(
+                include=["documents", "metadatas", "embeddings"], limit=PAGE_SIZE, offset=offset
+            ))
+            if not ids:
+                break
+            copied.update(ids)
+            offset += len(ids)
+
+        with embedding_service.lock:
+            live = set(collection.get(include=[]).get("ids") or [])
+            stale = sorted((live - copied) | (_rebuild_dirty[name] & live))
+            for i in range(0, len(stale), PAGE_SIZE):
+                _add_page(fresh, collection.get(
+                    ids=stale[i:i + PAGE_SIZE], include=["documents", "metadatas", "embeddings"]
+                ))
+            removed = sorted(copied - live)
+            if removed:
+                fresh.delete(ids=removed)
+            collection.modify(name=name + RETIRED_SUFFIX)
+            fresh.modify(name=name)
+            setattr(embedding_service, attr, fresh)
+    finally:
+        with embedding_service.lock:
+            _rebuild_dirty.pop(name, None)
+
+    logger.info(f"Rebuilt collection {name} ({len(live)} records)")
+    return fresh
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+def store_size_bytes() -> int:
+    size = _dir_size(settings.CHROMA_DIR) if os.path.isdir(settings.CHROMA_DIR) else 0
+    if engine.dialect.name == "sqlite" and engine.url.database:
+        try:
+            size += os.path.getsize(engine.url.database)
+        except OSError:
+            pass
+    return size
+
+def vacuum_database():
+    if engine.dialect.name not in ("sqlite", "postgresql"):
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+
+def vacuum_chroma_store():
+    """
+    VACUUM Chroma's own SQLite file, which never shrinks after deletes or
+    delete_collection. Writers are held off by the lock; if a reader keeps
+    the file busy past the timeout the vacuum is skipped until the next run.
+    """
+    path = os.path.join(settings.CHROMA_DIR, CHROMA_SQLITE_FILE)
+    if not os.path.exists(path):
+        return
+    with embedding_service.lock:
+        conn = sqlite3.connect(path, timeout=CHROMA_VACUUM_TIMEOUT_SECONDS, isolation_level=None)
+        try:
+            conn.execute("VACUUM")
+        except sqlite3.Error as e:
+            logger.warning(f"Chroma store vacuum skipped: {e}")
+        finally:
+            conn.close()
+
+def run_compaction() -> Dict:
+    """
+    Evict, archive, rebuild indexes and vacuum; returns the run's metrics.
+    Each store is only vacuumed when this run freed space in it, since
+    VACUUM blocks writers for its duration.
+
+    `bytes_reclaimed` is the drop in on-disk size of CHROMA_DIR (HNSW index
+    files plus the vacuumed chroma.sqlite3) and the app's SQLite file between
+    the start and end of the run. Space held by a collection retired in this
+    run is only freed, and counted, by the next run.
+    """
+    global last_compaction
+    started = datetime.utcnow()
+    size_before = store_size_bytes()
+
+    evicted = {"ttl": 0, "quota": 0}
+    rebuilt = []
+    dropped = []
+    for attr, quota_setting, ttl_setting in COMPACTED_COLLECTIONS:
+        collection = getattr(embedding_service, attr, None)
+        if collection is None:
+            continue
+        # Retired by the previous run; any query still holding it has long finished
+        # The handle is renamed aside by a rebuild, so keep the live name
+        name = collection.name
+        if _drop_collection(name + RETIRED_SUFFIX):
+            dropped.append(name + RETIRED_SUFFIX)
+        limits = getattr(settings, quota_setting), getattr(settings, ttl_setting)
+        for reason, count in evict_memories(collection, *limits).items():
+            evicted[reason] += count
+        if _pending_deletes[name] > 0:
+            rebuild_collection(attr)
+            _pending_deletes[name] = 0
+            rebuilt.append(name)
+    archived = archive_conversations()
+
+    vacuumed = []
+    if archived:
+        vacuum_database()
+        vacuumed.append("database")
+    if rebuilt or dropped or sum(evicted.values()):
+        vacuum_chroma_store()
+        vacuumed.append("chroma")
+
+    size_after = store_size_bytes()
+    last_compaction = {
+        "started_at": started.isoformat(),
+        "duration_seconds": round((datetime.utcnow() - started).total_seconds(), 3),
+        "evicted_ttl": evicted["ttl"],
+        "evicted_quota": evicted["quota"],
+        "archived_conversations": archived,
+        "rebuilt_collections": rebuilt,
+        "dropped_collections": dropped,
+        "vacuumed": vacuumed,
+        "bytes_before": size_before,
+        "bytes_after": size_after,
+        "bytes_reclaimed": max(size_before - size_after, 0),
+    }
+    logger.info(f"Compaction finished: {last_compaction}")
+    return last_compaction
+
+compaction_job = PeriodicJob(
+    "memory-compaction", settings.COMPACTION_INTERVAL_MINUTES * 60, run_compaction
+)
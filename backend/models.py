@@ -13,8 +13,27 @@ class User(Base):
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    # Never reuse ids once archival has emptied the table
+    __table_args__ = {"sqlite_autoincrement": True}
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, index=True)
     role = Column(String)  # 'user' or 'assistant' or 'system'
     text = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ConversationArchive(Base):
+    __tablename__ = "conversations_archive"
+    id = Column(Integer, primary_key=True, index=True)
+    original_id = Column(Integer, index=True)  # Conversation.id at archive time; may repeat
+    user_id = Column(Integer, index=True)
+    role = Column(String)
+    text = Column(Text)
+    created_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class IndexWatermark(Base):
+    __tablename__ = "index_watermarks"
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -5,6 +5,8 @@ from models import Conversation
 from schemas import ChatIn, ChatResponse
 from auth import get_user_id_from_auth_header
 from embeddings import embedding_service
+from config import settings
+from lifecycle import record_retrievals
 import logging
 import re
 
@@ -26,7 +28,7 @@ def sanitize_sensitive_info(text: str) -> str:
     
     return text
 
-def generate_ai_response(user_message: str, context: str, docs_count: int) -> str:
+def generate_ai_response(user_message: str, context: str, docs_count: int, conversations_count: int = 0) -> str:
     """
     Generate an intelligent response based on the user message and retrieved context.
     This is a simplified version - you can integrate with OpenAI, Gemini, or other LLMs.
@@ -38,6 +40,9 @@ def generate_ai_response(user_message: str, context: str, docs_count: int) -> st
     # Simple rule-based response generation
     # In a real implementation, you'd call an LLM API here
     
+    if docs_count == 0 and conversations_count > 0:
+        return f"I couldn't find this in your stored documents, but it came up in {conversations_count} of our earlier conversations. Would you like me to build on what we discussed before?"
+    
     if docs_count == 0:
         return "I couldn't find any relevant information in your stored documents about this topic. You might want to upload relevant documents first using the upload feature."
     
@@ -58,6 +63,35 @@ def generate_ai_response(user_message: str, context: str, docs_count: int) -> st
         # Generic intelligent response
         return f"Based on the {docs_count} relevant documents I found in your memory, I can help answer your question about '{user_message}'. The documents contain information that might be relevant to your query. What specific aspect would you like me to focus on?"
 
+def retrieve_memories(collection, q_emb, user_id: int, top_k: int, memory_type: str, weight: float = 1.0) -> list:
+    """
+    Query one memory collection for this user's closest entries.
+    `score` is the distance scaled by `weight` so collections can be blended.
+    """
+    res = collection.query(
+        query_embeddings=[q_emb], 
+        n_results=top_k,
+        where={"user_id": user_id},
+        include=["documents", "metadatas", "distances"]
+    )
+    
+    hits = []
+    if res and res.get("documents"):
+        for i, doc in enumerate(res["documents"][0]):
+            meta = res["metadatas"][0][i] if res.get("metadatas") else {}
+            if meta.get("user_id") == user_id:
+                distance = res["distances"][0][i] if res.get("distances") else 0
+                hits.append({
+                    "id": res["ids"][0][i],
+                    # Sanitize sensitive info in retrieved memories
+                    "text": sanitize_sensitive_info(doc),
+                    "meta": meta,
+                    "distance": distance,
+                    "score": distance * weight,
+                    "memory_type": memory_type
+                })
+    return hits
+
 @router.post("/", response_model=ChatResponse)
 def chat(
     payload: ChatIn, 
@@ -87,32 +121,42 @@ def chat(
         # Embed query
         q_emb = embedding_service.embed_texts([message])[0]
         
-        # Retrieve relevant documents for this user
-        res = embedding_service.collection.query(
-            query_embeddings=[q_emb], 
-            n_results=payload.top_k,
-            where={"user_id": user_id},
-            include=["documents", "metadatas", "distances"]
+        # Retrieve relevant documents, blended with past conversation memories
+        hits = retrieve_memories(
+            embedding_service.collection, q_emb, user_id, payload.top_k, "document"
         )
+        if payload.include_conversations and embedding_service.conversation_collection:
+            hits += [
+                h for h in retrieve_memories(
+                    embedding_service.conversation_collection, q_emb, user_id, payload.top_k,
+                    "conversation", settings.CONVERSATION_MEMORY_WEIGHT
+                )
+                if h["meta"].get("conversation_id") != conv.id
+            ]
+        hits = sorted(hits, key=lambda h: h["score"])[:payload.top_k]
+        
+        # Track retrieval frequency for lifecycle eviction
+        for collection, memory_type in (
+            (embedding_service.collection, "document"),
+            (embedding_service.conversation_collection, "conversation"),
+        ):
+            kept = [h for h in hits if h["memory_type"] == memory_type]
+            record_retrievals([h["id"] for h in kept], [h["meta"] for h in kept], collection)
         
-        docs = []
-        if res and res.get("documents"):
-            for i, doc in enumerate(res["documents"][0]):
-                meta = res["metadatas"][0][i] if res.get("metadatas") else {}
-                if meta.get("user_id") == user_id:
-                    # Sanitize sensitive info in retrieved documents
-                    safe_text = sanitize_sensitive_info(doc)
-                    docs.append({
-                        "text": safe_text, 
-                        "meta": meta, 
-                        "distance": res["distances"][0][i] if res.get("distances") else 0
-                    })
+        docs = [{
+            "text": h["text"],
+            "meta": h["meta"],
+            "distance": h["distance"],
+            "memory_type": h["memory_type"]
+        } for h in hits]
         
-        # Build context from retrieved docs
-        context = "\n\n---\n\n".join([d["text"] for d in docs[:6]])
+        # Build context from retrieved documents only; the reply is keyword-matched
+        # against it, so recalled conversation text must not steer it
+        document_texts = [d["text"] for d in docs if d["memory_type"] == "document"]
+        context = "\n\n---\n\n".join(document_texts[:6])
         
         # Generate intelligent AI response
-        reply = generate_ai_response(message, context, len(docs))
+        reply = generate_ai_response(message, context, len(document_texts), len(docs) - len(document_texts))
         
         # Store assistant reply
         conv2 = Conversation(user_id=user_id, role="assistant", text=reply)
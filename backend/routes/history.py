@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlalchemy.orm import Session
 from database import get_db
-from models import Conversation
+from models import Conversation, ConversationArchive
 from schemas import HistoryResponse
 from auth import get_user_id_from_auth_header
 
@@ -14,7 +14,10 @@ def history(
 ):
     try:
         user_id = get_user_id_from_auth_header(authorization)
-        rows = db.query(Conversation).filter(Conversation.user_id == user_id).order_by(Conversation.created_at.asc()).all()
+        # Rows moved aside by memory compaction are still part of the user's history
+        archived = db.query(ConversationArchive).filter(ConversationArchive.user_id == user_id).all()
+        live = db.query(Conversation).filter(Conversation.user_id == user_id).all()
+        rows = sorted(archived + live, key=lambda r: r.created_at)
         
         history_data = [{
             "role": r.role, 
@@ -4,6 +4,8 @@ from database import get_db
 from schemas import IngestResponse
 from auth import get_user_id_from_auth_header
 from embeddings import embedding_service
+from lifecycle import enforce_user_quota
+from config import settings
 from utils import extract_text_from_file, chunk_text, generate_uuid_list
 from datetime import datetime
 import logging
@@ -56,6 +58,13 @@ async def ingest(
         if not chunks:
             raise HTTPException(status_code=400, detail="No text chunks created")
         
+        quota = settings.MEMORY_MAX_CHUNKS_PER_USER
+        if quota > 0 and len(chunks) > quota:
+            raise HTTPException(
+                status_code=400,
+                detail=f"File produces {len(chunks)} chunks, more than the per-user quota of {quota}"
+            )
+        
         # Generate embeddings
         logger.info("Generating embeddings...")
         try:
@@ -77,23 +86,35 @@ async def ingest(
         # Store in ChromaDB
         logger.info("Storing in ChromaDB...")
         try:
-            embedding_service.collection.add(
-                ids=ids, 
-                documents=chunks, 
-                metadatas=metadatas, 
-                embeddings=embeddings
-            )
+            with embedding_service.lock:
+                embedding_service.collection.add(
+                    ids=ids, 
+                    documents=chunks, 
+                    metadatas=metadatas, 
+                    embeddings=embeddings
+                )
             logger.info("Successfully stored in ChromaDB")
         except Exception as chroma_error:
             logger.error(f"ChromaDB storage failed: {chroma_error}")
             raise HTTPException(status_code=500, detail=f"Storage failed: {str(chroma_error)}")
         
+        # Keep the user within their chunk quota, never evicting this upload
+        evicted = 0
+        try:
+            evicted = enforce_user_quota(user_id, protected=ids)
+        except Exception as quota_error:
+            logger.error(f"Quota enforcement failed: {quota_error}")
+        
         logger.info("Upload completed successfully")
         
+        message = f"Successfully ingested {len(chunks)} chunks from {file.filename}"
+        if evicted:
+            message += f"; evicted {evicted} older chunks to stay within your quota"
         return {
             "success": True, 
             "ingested_chunks": len(chunks),
-            "message": f"Successfully ingested {len(chunks)} chunks from {file.filename}"
+            "evicted_chunks": evicted,
+            "message": message
         }
         
     except HTTPException:
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException, Header
+from schemas import MemoryStatsResponse
+from auth import get_user_id_from_auth_header
+from embeddings import embedding_service
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/memory", tags=["memory"])
+
+def _count_user_records(collection, user_id: int) -> int:
+    if not collection:
+        return 0
+    res = collection.get(where={"user_id": user_id}, include=[])
+    return len(res.get("ids") or [])
+
+@router.get("/stats", response_model=MemoryStatsResponse)
+def memory_stats(authorization: str = Header(None)):
+    try:
+        user_id = get_user_id_from_auth_header(authorization)
+        
+        return {
+            "chunk_count": _count_user_records(embedding_service.collection, user_id),
+            "max_chunks": settings.MEMORY_MAX_CHUNKS_PER_USER,
+            "ttl_days": settings.MEMORY_TTL_DAYS,
+            "conversation_memory_count": _count_user_records(embedding_service.conversation_collection, user_id),
+            "conversation_max_memories": settings.CONVERSATION_MEMORY_MAX_PER_USER,
+            "conversation_ttl_days": settings.CONVERSATION_MEMORY_TTL_DAYS,
+            "success": True
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Memory stats error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
@@ -13,11 +13,13 @@ class LoginIn(BaseModel):
 class IngestResponse(BaseModel):
     success: bool
     ingested_chunks: int
+    evicted_chunks: int = 0
     message: str = ""
 
 class ChatIn(BaseModel):
     message: str
     top_k: Optional[int] = 4
+    include_conversations: Optional[bool] = True
 
 class ChatResponse(BaseModel):
     reply: str
@@ -28,6 +30,15 @@ class HistoryResponse(BaseModel):
     history: List[dict]
     success: bool = True
 
+class MemoryStatsResponse(BaseModel):
+    chunk_count: int
+    max_chunks: int
+    ttl_days: int
+    conversation_memory_count: int
+    conversation_max_memories: int
+    conversation_ttl_days: int
+    success: bool = True
+
 class ConversationOut(BaseModel):
     role: str
     text: str
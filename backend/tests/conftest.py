@@ -0,0 +1,146 @@
+import os
+import sys
+import tempfile
+import threading
+import types
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Point the app at throwaway stores before config is imported
+_tmp_dir = tempfile.mkdtemp(prefix="memory-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ["CHROMA_DIR"] = os.path.join(_tmp_dir, "chroma")
+
+
+class FakeCollection:
+    """In-memory stand-in for the subset of the Chroma collection API the backend uses."""
+
+    def __init__(self, name):
+        self.name = name
+        self.metadata = None
+        self.records = {}  # id -> (document, metadata, embedding)
+
+    @staticmethod
+    def _match(meta, where):
+        if not where:
+            return True
+        if "$and" in where:
+            return all(FakeCollection._match(meta, w) for w in where["$and"])
+        return all(meta.get(k) == v for k, v in where.items())
+
+    def get(self, ids=None, where=None, include=None, limit=None, offset=0):
+        keys = [i for i in (ids if ids is not None else self.records) if i in self.records]
+        keys = [i for i in keys if self._match(self.records[i][1], where)]
+        keys = keys[offset:offset + limit] if limit is not None else keys[offset:]
+        return {
+            "ids": keys,
+            "documents": [self.records[i][0] for i in keys],
+            "metadatas": [dict(self.records[i][1]) for i in keys],
+            "embeddings": [self.records[i][2] for i in keys],
+        }
+
+    def query(self, query_embeddings, n_results, where=None, include=None):
+        """Nearest records by absolute difference of the first embedding component."""
+        query = query_embeddings[0][0]
+        matches = sorted(
+            (abs(emb[0] - query), i)
+            for i, (_, meta, emb) in self.records.items()
+            if self._match(meta, where)
+        )[:n_results]
+        return {
+            "ids": [[i for _, i in matches]],
+            "documents": [[self.records[i][0] for _, i in matches]],
+            "metadatas": [[dict(self.records[i][1]) for _, i in matches]],
+            "distances": [[d for d, _ in matches]],
+        }
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        for i, doc, meta, emb in zip(ids, documents, metadatas, embeddings):
+            self.records[i] = (doc, dict(meta), emb)
+
+    add = upsert
+
+    def update(self, ids, metadatas):
+        for i, meta in zip(ids, metadatas):
+            doc, _, emb = self.records[i]
+            self.records[i] = (doc, dict(meta), emb)
+
+    def delete(self, ids):
+        for i in ids:
+            self.records.pop(i, None)
+
+    def modify(self, name):
+        self.client.collections[name] = self.client.collections.pop(self.name)
+        self.name = name
+
+
+class FakeClient:
+    def __init__(self):
+        self.collections = {}
+
+    def create_collection(self, name, metadata=None):
+        if name in self.collections:
+            raise ValueError(f"Collection {name} already exists")
+        collection = FakeCollection(name)
+        collection.client = self
+        collection.metadata = metadata
+        self.collections[name] = collection
+        return collection
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+    def delete_collection(self, name):
+        del self.collections[name]
+
+
+class FakeEmbeddingService:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        self.chroma_client = FakeClient()
+        self.collection = self.chroma_client.create_collection("user_memories")
+        self.conversation_collection = self.chroma_client.create_collection("conversation_memories")
+        self.embedded = []
+
+    def embed_texts(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(t))] for t in texts]
+
+
+# The real module loads an embedding model and opens Chroma at import time
+_fake_embeddings = types.ModuleType("embeddings")
+_fake_embeddings.embedding_service = FakeEmbeddingService()
+_fake_embeddings.MEMORY_COLLECTION = "user_memories"
+_fake_embeddings.CONVERSATION_COLLECTION = "conversation_memories"
+_fake_embeddings.COMPACTING_SUFFIX = "_compacting"
+_fake_embeddings.RETIRED_SUFFIX = "_retired"
+sys.modules["embeddings"] = _fake_embeddings
+
+
+@pytest.fixture
+def service():
+    import lifecycle
+
+    _fake_embeddings.embedding_service.reset()
+    lifecycle._pending_deletes.clear()
+    return _fake_embeddings.embedding_service
+
+
+@pytest.fixture
+def db():
+    from database import SessionLocal, engine
+    from models import Base
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
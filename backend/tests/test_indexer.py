@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import indexer
+from config import settings
+from models import Conversation, IndexWatermark
+
+
+@pytest.fixture(autouse=True)
+def _settings(monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSATION_INDEX_SETTLE_SECONDS", 10)
+    monkeypatch.setattr(settings, "CONVERSATION_INDEX_BATCH_SIZE", 2)
+
+
+def _row(db, text, role="user", seconds_ago=60, **kwargs):
+    row = Conversation(
+        user_id=1, role=role, text=text,
+        created_at=datetime.utcnow() - timedelta(seconds=seconds_ago), **kwargs
+    )
+    db.add(row)
+    db.commit()
+    return row
+
+
+def _watermark(db):
+    db.expire_all()
+    return db.query(IndexWatermark).filter(IndexWatermark.name == indexer.WATERMARK_NAME).one().last_id
+
+
+def _documents(collection):
+    return sorted(doc for doc, _, _ in collection.records.values())
+
+
+def test_index_new_turns_indexes_user_turns_in_batches(service, db):
+    rows = [_row(db, "hello"), _row(db, "setup", role="system"), _row(db, "hi there", role="assistant")]
+
+    assert indexer.index_new_turns() == 1
+    assert _watermark(db) == rows[-1].id
+    assert _documents(service.conversation_collection) == ["hello"]
+
+    _row(db, "later")
+    assert indexer.index_new_turns() == 1
+    assert indexer.index_new_turns() == 0
+    assert service.embedded == ["hello", "later"]
+
+
+def test_index_new_turns_waits_for_rows_to_settle(service, db):
+    first = _row(db, "settled")
+    _row(db, "just written", seconds_ago=0)
+    _row(db, "settled but after a young row")
+
+    assert indexer.index_new_turns() == 1
+    assert _watermark(db) == first.id
+    assert _documents(service.conversation_collection) == ["settled"]
+
+
+def test_replayed_batch_is_upserted_not_duplicated(service, db):
+    _row(db, "once")
+    indexer.index_new_turns()
+    db.query(IndexWatermark).update({"last_id": 0})
+    db.commit()
+
+    indexer.index_new_turns()
+    assert _documents(service.conversation_collection) == ["once"]
+
+
+def test_watermark_resets_when_ids_are_reused(service, db):
+    first_id = _row(db, "before archival").id
+    _row(db, "also archived")
+    indexer.index_new_turns()
+    db.query(Conversation).delete()
+    db.commit()
+
+    # SQLite without AUTOINCREMENT hands the same id out again
+    _row(db, "after archival", id=first_id, seconds_ago=30)
+    assert indexer.index_new_turns() == 1
+    assert _documents(service.conversation_collection) == [
+        "after archival", "also archived", "before archival"
+    ]
+
+
+def test_summarize_truncates_each_turn():
+    turns = [
+        {"text": "x" * 500, "meta": {"role": "user", "timestamp": "2026-01-02T10:00:00"}},
+        {"text": "short  reply", "meta": {"role": "assistant", "timestamp": "2026-01-03T10:00:00"}},
+    ]
+    summary, covered = indexer._summarize(turns)
+    assert covered == turns
+    lines = summary.split("\n")
+    assert lines[0] == "Earlier conversation (2026-01-02 to 2026-01-03):"
+    assert lines[1] == "user: " + "x" * indexer.SUMMARY_LINE_CHARS + "..."
+    assert lines[2] == "assistant: short reply"
+
+
+def test_summarize_old_turns_collapses_only_full_groups(service, monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSATION_SUMMARY_AFTER_DAYS", 7)
+    monkeypatch.setattr(settings, "CONVERSATION_SUMMARY_GROUP_SIZE", 3)
+    old = (datetime.utcnow() - timedelta(days=10)).isoformat()
+    recent = datetime.utcnow().isoformat()
+    for i in range(8):
+        service.conversation_collection.add(
+            ids=[f"turn-{i}-x"],
+            documents=[f"turn {i}"],
+            metadatas=[{
+                "user_id": 1, "conversation_id": i, "role": "user", "kind": "turn",
+                "timestamp": recent if i == 7 else old,
+            }],
+            embeddings=[[0.0]],
+        )
+
+    assert indexer.summarize_old_turns() == 6
+    kinds = sorted(
+        (meta["kind"], meta.get("conversation_id", meta.get("first_conversation_id")))
+        for _, meta, _ in service.conversation_collection.records.values()
+    )
+    assert kinds == [("summary", 0), ("summary", 3), ("turn", 6), ("turn", 7)]
+
+
+def test_summarize_old_turns_covers_every_turn_with_default_settings(service):
+    old = (datetime.utcnow() - timedelta(days=settings.CONVERSATION_SUMMARY_AFTER_DAYS + 1)).isoformat()
+    group_size = settings.CONVERSATION_SUMMARY_GROUP_SIZE
+    for i in range(group_size):
+        text = f"question {i} " + "about my deployment setup and what went wrong " * 8
+        service.conversation_collection.add(
+            ids=[f"turn-{i}-x"],
+            documents=[text],
+            metadatas=[{
+                "user_id": 1, "conversation_id": i, "role": "user", "kind": "turn", "timestamp": old,
+            }],
+            embeddings=[[0.0]],
+        )
+
+    assert indexer.summarize_old_turns() == group_size
+    [(summary, meta, _)] = service.conversation_collection.records.values()
+    assert len(summary) <= indexer.SUMMARY_MAX_CHARS
+    assert all(f"question {i} " in summary for i in range(group_size))
+    assert (meta["first_conversation_id"], meta["last_conversation_id"]) == (0, group_size - 1)
+
+
+def test_summarize_old_turns_keeps_turns_left_out_of_the_summary(service, monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSATION_SUMMARY_GROUP_SIZE", 3)
+    monkeypatch.setattr(indexer, "SUMMARY_MAX_CHARS", 70)
+    old = (datetime.utcnow() - timedelta(days=settings.CONVERSATION_SUMMARY_AFTER_DAYS + 1)).isoformat()
+    for i in range(3):
+        service.conversation_collection.add(
+            ids=[f"turn-{i}-x"], documents=[f"turn {i}"],
+            metadatas=[{"user_id": 1, "conversation_id": i, "role": "user", "kind": "turn", "timestamp": old}],
+            embeddings=[[0.0]],
+        )
+
+    collapsed = indexer.summarize_old_turns()
+    remaining = sorted(i for i in service.conversation_collection.records if i.startswith("turn-"))
+    assert 0 < collapsed < 3
+    assert len(remaining) == 3 - collapsed
@@ -0,0 +1,181 @@
+import threading
+from datetime import datetime, timedelta
+
+import lifecycle
+from config import settings
+from models import Conversation, ConversationArchive
+
+
+def _meta(user_id=1, days_ago=0, retrieval_count=0, retrieved_days_ago=None):
+    meta = {
+        "user_id": user_id,
+        "timestamp": (datetime.utcnow() - timedelta(days=days_ago)).isoformat(),
+        "retrieval_count": retrieval_count,
+    }
+    if retrieved_days_ago is not None:
+        meta["last_retrieved"] = (datetime.utcnow() - timedelta(days=retrieved_days_ago)).isoformat()
+    return meta
+
+
+def _add(collection, record_id, meta):
+    collection.add(ids=[record_id], documents=[record_id], metadatas=[meta], embeddings=[[0.0]])
+
+
+def test_last_used_prefers_latest_retrieval():
+    meta = _meta(days_ago=30, retrieved_days_ago=1)
+    assert datetime.utcnow() - lifecycle._last_used(meta) < timedelta(days=2)
+    assert lifecycle._last_used({}) == datetime.min
+
+
+def test_over_quota_ranks_least_retrieved_then_least_recent():
+    records = [
+        ("popular", _meta(days_ago=50, retrieval_count=5)),
+        ("old", _meta(days_ago=40)),
+        ("new", _meta(days_ago=1)),
+    ]
+    assert lifecycle._over_quota(records, 2) == ["old"]
+    assert lifecycle._over_quota(records, 1) == ["old", "new"]
+    assert lifecycle._over_quota(records, 3) == []
+    assert lifecycle._over_quota(records, 0) == []
+
+
+def test_over_quota_never_picks_protected():
+    records = [
+        ("kept-1", _meta(days_ago=10, retrieval_count=1)),
+        ("kept-2", _meta(days_ago=5, retrieval_count=1)),
+        ("upload", _meta()),
+    ]
+    assert lifecycle._over_quota(records, 2, protected=["upload"]) == ["kept-1"]
+
+
+def test_enforce_user_quota_keeps_new_upload(service, monkeypatch):
+    monkeypatch.setattr(settings, "MEMORY_MAX_CHUNKS_PER_USER", 3)
+    for i in range(3):
+        _add(service.collection, f"old-{i}", _meta(days_ago=10 - i, retrieval_count=1))
+    _add(service.collection, "other-user", _meta(user_id=2, days_ago=100))
+    for i in range(2):
+        _add(service.collection, f"new-{i}", _meta())
+
+    evicted = lifecycle.enforce_user_quota(1, protected=["new-0", "new-1"])
+
+    assert evicted == 2
+    assert set(service.collection.records) == {"old-2", "new-0", "new-1", "other-user"}
+    assert lifecycle._pending_deletes["user_memories"] == 2
+
+
+def test_evict_memories_drops_unused_past_ttl(service):
+    _add(service.collection, "stale", _meta(days_ago=60))
+    _add(service.collection, "recalled", _meta(days_ago=60, retrieval_count=2, retrieved_days_ago=3))
+    _add(service.collection, "fresh", _meta(days_ago=1))
+
+    assert lifecycle.evict_memories(service.collection, 0, 30) == {"ttl": 1, "quota": 0}
+    assert set(service.collection.records) == {"recalled", "fresh"}
+
+
+def test_record_retrievals_bumps_metadata(service):
+    _add(service.collection, "a", _meta())
+    lifecycle.record_retrievals(["a"], [service.collection.records["a"][1]])
+    meta = service.collection.records["a"][1]
+    assert meta["retrieval_count"] == 1
+    assert "last_retrieved" in meta
+
+
+def test_record_retrievals_skips_when_lock_busy(service):
+    _add(service.collection, "a", _meta())
+    held, release = threading.Event(), threading.Event()
+
+    def hold_lock():
+        with service.lock:
+            held.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=hold_lock)
+    worker.start()
+    held.wait(5)
+    try:
+        lifecycle.record_retrievals(["a"], [service.collection.records["a"][1]])
+    finally:
+        release.set()
+        worker.join()
+    assert service.collection.records["a"][1]["retrieval_count"] == 0
+
+
+def test_archive_conversations_survives_reused_ids(db, monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSATION_ARCHIVE_DAYS", 90)
+    old = datetime.utcnow() - timedelta(days=120)
+
+    db.add(Conversation(id=1, user_id=1, role="user", text="first", created_at=old))
+    db.commit()
+    assert lifecycle.archive_conversations() == 1
+
+    # Same id again, as SQLite hands out once the table has been emptied
+    db.add(Conversation(id=1, user_id=1, role="user", text="second", created_at=old))
+    db.add(Conversation(user_id=1, role="user", text="recent"))
+    db.commit()
+    assert lifecycle.archive_conversations() == 1
+
+    archived = db.query(ConversationArchive).order_by(ConversationArchive.id).all()
+    assert [(a.original_id, a.text) for a in archived] == [(1, "first"), (1, "second")]
+    assert [c.text for c in db.query(Conversation).all()] == ["recent"]
+
+
+def test_rebuild_collection_swaps_in_live_records(service):
+    old = service.collection
+    for i in range(3):
+        _add(old, f"c-{i}", _meta())
+    old.delete(ids=["c-1"])
+    retired_query = old.get()  # a query holding the old handle keeps working
+
+    fresh = lifecycle.rebuild_collection("collection")
+
+    assert service.collection is fresh
+    assert fresh.name == "user_memories"
+    assert set(fresh.records) == {"c-0", "c-2"}
+    assert set(service.chroma_client.collections) == {
+        "user_memories", "user_memories_retired", "conversation_memories"
+    }
+    assert old.get()["ids"] == retired_query["ids"]
+
+
+def test_rebuild_collection_keeps_updates_made_during_copy(service, monkeypatch):
+    old = service.collection
+    for i in range(2):
+        _add(old, f"c-{i}", _meta())
+    original_get = old.get
+
+    def get_then_retrieve(*args, **kwargs):
+        page = original_get(*args, **kwargs)
+        if kwargs.get("offset") == 0 and "embeddings" in (kwargs.get("include") or []):
+            # A chat retrieval lands after this page was read but before the swap
+            lifecycle.record_retrievals(["c-0"], [old.records["c-0"][1]], old)
+        return page
+
+    monkeypatch.setattr(old, "get", get_then_retrieve)
+    fresh = lifecycle.rebuild_collection("collection")
+
+    assert fresh.records["c-0"][1]["retrieval_count"] == 1
+    assert fresh.records["c-1"][1]["retrieval_count"] == 0
+    assert lifecycle._rebuild_dirty == {}
+
+
+def test_run_compaction_skips_vacuum_when_nothing_changed(service, db, monkeypatch):
+    calls = []
+    monkeypatch.setattr(lifecycle, "vacuum_database", lambda: calls.append("database"))
+    monkeypatch.setattr(lifecycle, "vacuum_chroma_store", lambda: calls.append("chroma"))
+    monkeypatch.setattr(settings, "MEMORY_TTL_DAYS", 30)
+    _add(service.collection, "fresh", _meta())
+
+    metrics = lifecycle.run_compaction()
+    assert calls == [] and metrics["vacuumed"] == []
+
+    _add(service.collection, "stale", _meta(days_ago=60))
+    metrics = lifecycle.run_compaction()
+    assert calls == ["chroma"]
+    assert metrics["evicted_ttl"] == 1
+    assert metrics["rebuilt_collections"] == ["user_memories"]
+    assert lifecycle._pending_deletes["user_memories"] == 0
+
+    metrics = lifecycle.run_compaction()
+    assert metrics["rebuilt_collections"] == []
+    assert metrics["dropped_collections"] == ["user_memories_retired"]
+    assert calls == ["chroma", "chroma"]
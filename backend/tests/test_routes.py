@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+
+import lifecycle
+from auth import create_access_token
+from config import settings
+from models import Conversation
+from schemas import ChatIn
+from routes.chat import chat, retrieve_memories
+from routes.history import history
+from routes.memory import memory_stats
+
+
+def _auth(user_id=1):
+    return f"Bearer {create_access_token({'sub': str(user_id)})}"
+
+
+def test_history_includes_archived_conversations(db, monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSATION_ARCHIVE_DAYS", 90)
+    db.add(Conversation(user_id=1, role="user", text="long ago", created_at=datetime.utcnow() - timedelta(days=120)))
+    db.add(Conversation(user_id=1, role="user", text="today"))
+    db.add(Conversation(user_id=2, role="user", text="someone else"))
+    db.commit()
+    assert lifecycle.archive_conversations() == 1
+
+    res = history(authorization=_auth(), db=db)
+    assert [h["text"] for h in res["history"]] == ["long ago", "today"]
+
+
+def test_memory_stats_reports_only_the_callers_memories(service, monkeypatch):
+    service.collection.add(
+        ids=["mine", "theirs"], documents=["a", "b"],
+        metadatas=[{"user_id": 1}, {"user_id": 2}], embeddings=[[0.0], [0.0]]
+    )
+    service.conversation_collection.add(
+        ids=["turn-1"], documents=["hi"], metadatas=[{"user_id": 1, "kind": "turn"}], embeddings=[[0.0]]
+    )
+    monkeypatch.setattr(lifecycle, "last_compaction", {"bytes_reclaimed": 123})
+
+    res = memory_stats(authorization=_auth())
+    assert res["chunk_count"] == 1
+    assert res["conversation_memory_count"] == 1
+    assert res["conversation_max_memories"] == settings.CONVERSATION_MEMORY_MAX_PER_USER
+    assert "last_compaction" not in res
+
+
+def _memory(collection, record_id, text, distance, user_id=1, **meta):
+    # The fake embedder maps a text to [len(text)], so offset from the query length
+    collection.add(
+        ids=[record_id], documents=[text],
+        metadatas=[{"user_id": user_id, **meta}], embeddings=[[float(len(QUESTION) + distance)]]
+    )
+
+
+QUESTION = "how do I deploy the app?"
+
+
+def test_retrieve_memories_scales_distance_by_weight(service):
+    _memory(service.conversation_collection, "turn-1", "earlier question", 2, kind="turn")
+    _memory(service.conversation_collection, "turn-2", "not mine", 0, user_id=2, kind="turn")
+
+    hits = retrieve_memories(
+        service.conversation_collection, [float(len(QUESTION))], 1, 4, "conversation", 1.5
+    )
+    assert [(h["id"], h["distance"], h["score"], h["memory_type"]) for h in hits] == [
+        ("turn-1", 2.0, 3.0, "conversation")
+    ]
+
+
+def test_chat_blends_documents_and_conversations(service, db):
+    _memory(service.collection, "doc-1", "deployment guide", 1, source="guide.txt")
+    _memory(service.conversation_collection, "turn-9", "we talked about deploying", 2, kind="turn", conversation_id=9)
+    # Memory for the row this request is about to store (first id in a fresh table)
+    _memory(service.conversation_collection, "turn-1", QUESTION, 0, kind="turn", conversation_id=1)
+
+    res = chat(ChatIn(message=QUESTION), authorization=_auth(), db=db)
+
+    assert [(d["text"], d["memory_type"]) for d in res["retrieved"]] == [
+        ("deployment guide", "document"), ("we talked about deploying", "conversation")
+    ]
+    assert "1 relevant documents" in res["reply"]
+    assert service.collection.records["doc-1"][1]["retrieval_count"] == 1
+    assert service.conversation_collection.records["turn-9"][1]["retrieval_count"] == 1
+
+
+def test_chat_without_conversations_only_queries_documents(service, db):
+    _memory(service.conversation_collection, "turn-9", "we talked about deploying", 0, kind="turn", conversation_id=9)
+
+    res = chat(ChatIn(message=QUESTION, include_conversations=False), authorization=_auth(), db=db)
+
+    assert res["retrieved"] == []
+    assert res["reply"].startswith("I couldn't find any relevant information")
+
+
+def test_chat_reports_conversation_only_hits_as_conversations(service, db):
+    _memory(service.conversation_collection, "turn-9", "we talked about deploying", 1, kind="turn", conversation_id=9)
+
+    res = chat(ChatIn(message=QUESTION), authorization=_auth(), db=db)
+
+    assert res["reply"].startswith("I couldn't find this in your stored documents")
+    assert "1 of our earlier conversations" in res["reply"]
+
+
+def test_chat_keyword_matching_ignores_conversation_hits(service, db):
+    _memory(service.collection, "doc-1", "deployment guide", 1, source="guide.txt")
+    _memory(service.conversation_collection, "turn-9", "which payment provider?", 2, kind="turn", conversation_id=9)
+
+    res = chat(ChatIn(message=QUESTION), authorization=_auth(), db=db)
+
+    assert len(res["retrieved"]) == 2
+    assert res["reply"].startswith("Based on the 1 relevant documents")